@@ -50,6 +50,11 @@ except ImportError:
 
 
 class CoderImpl(object):
+  # Impl attributes are read for every element; when not compiled, slots make
+  # these reads cheaper than instance dictionary lookups.  Subclasses that are
+  # not declared in coder_impl.pxd must not declare __slots__: when compiled,
+  # their cpdef overrides are only found through the instance dictionary.
+  __slots__ = ()
 
   def encode_to_stream(self, value, stream, nested):
     """Reads object from potentially-nested encoding in stream."""
@@ -99,6 +104,8 @@ class CoderImpl(object):
 class SimpleCoderImpl(CoderImpl):
   """Subclass of CoderImpl implementing stream methods using encode/decode."""
 
+  __slots__ = ()
+
   def encode_to_stream(self, value, stream, nested):
     """Reads object from potentially-nested encoding in stream."""
     stream.write(self.encode(value), nested)
@@ -111,6 +118,8 @@ class SimpleCoderImpl(CoderImpl):
 class StreamCoderImpl(CoderImpl):
   """Subclass of CoderImpl implementing encode/decode using stream methods."""
 
+  __slots__ = ()
+
   def encode(self, value):
     out = create_OutputStream()
     self.encode_to_stream(value, out, False)
@@ -133,6 +142,8 @@ class CallbackCoderImpl(CoderImpl):
   is not overwritten.
   """
 
+  __slots__ = ('_encoder', '_decoder', '_size_estimator')
+
   def __init__(self, encoder, decoder, size_estimator=None):
     self._encoder = encoder
     self._decoder = decoder
@@ -166,6 +177,7 @@ class CallbackCoderImpl(CoderImpl):
 
 
 class DeterministicFastPrimitivesCoderImpl(CoderImpl):
+  __slots__ = ('_underlying_coder', '_step_label')
 
   def __init__(self, coder, step_label):
     self._underlying_coder = coder
@@ -235,6 +247,7 @@ SET_TYPE = 8
 
 
 class FastPrimitivesCoderImpl(StreamCoderImpl):
+  __slots__ = ('fallback_coder_impl',)
 
   def __init__(self, fallback_coder_impl):
     self.fallback_coder_impl = fallback_coder_impl
@@ -283,6 +296,8 @@ class FastPrimitivesCoderImpl(StreamCoderImpl):
       stream.write_byte(value)
     else:
       stream.write_byte(UNKNOWN_TYPE)
+      # fallback_coder_impl is typed in coder_impl.pxd, so when compiled this
+      # is already a direct vtable call into the fallback impl.
       self.fallback_coder_impl.encode_to_stream(value, stream, nested)
 
   def decode_from_stream(self, stream, nested):
@@ -321,6 +336,8 @@ class FastPrimitivesCoderImpl(StreamCoderImpl):
 class BytesCoderImpl(CoderImpl):
   """A coder for bytes/str objects."""
 
+  __slots__ = ()
+
   def encode_to_stream(self, value, out, nested):
     out.write(value, nested)
 
@@ -336,6 +353,7 @@ class BytesCoderImpl(CoderImpl):
 
 
 class FloatCoderImpl(StreamCoderImpl):
+  __slots__ = ()
 
   def encode_to_stream(self, value, out, nested):
     out.write_bigendian_double(value)
@@ -379,6 +397,8 @@ class IntervalWindowCoderImpl(StreamCoderImpl):
 
 
 class TimestampCoderImpl(StreamCoderImpl):
+  __slots__ = ()
+
   def encode_to_stream(self, value, out, nested):
     out.write_bigendian_int64(value.micros)
 
@@ -397,6 +417,8 @@ small_ints = [chr(_) for _ in range(128)]
 class VarIntCoderImpl(StreamCoderImpl):
   """A coder for long/int objects."""
 
+  __slots__ = ()
+
   def encode_to_stream(self, value, out, nested):
     out.write_var_int64(value)
 
@@ -424,6 +446,8 @@ class VarIntCoderImpl(StreamCoderImpl):
 class SingletonCoderImpl(CoderImpl):
   """A coder that always encodes exactly one value."""
 
+  __slots__ = ('_value',)
+
   def __init__(self, value):
     self._value = value
 
@@ -447,9 +471,12 @@ class SingletonCoderImpl(CoderImpl):
 class AbstractComponentCoderImpl(StreamCoderImpl):
   """CoderImpl for coders that are comprised of several component coders."""
 
+  __slots__ = ('_coder_impls',)
+
   def __init__(self, coder_impls):
     for c in coder_impls:
       assert isinstance(c, CoderImpl), c
+    # A tuple argument is stored as is rather than copied.
     self._coder_impls = tuple(coder_impls)
 
   def _extract_components(self, value):
@@ -499,6 +526,8 @@ class AbstractComponentCoderImpl(StreamCoderImpl):
 class TupleCoderImpl(AbstractComponentCoderImpl):
   """A coder for tuple objects."""
 
+  __slots__ = ()
+
   def _extract_components(self, value):
     return value
 
@@ -528,6 +557,8 @@ class SequenceCoderImpl(StreamCoderImpl):
 
   """
 
+  __slots__ = ('_elem_coder',)
+
   # Default buffer size of 64kB of handling iterables of unknown length.
   _DEFAULT_BUFFER_SIZE = 64 * 1024
 
@@ -613,6 +644,8 @@ class SequenceCoderImpl(StreamCoderImpl):
 class TupleSequenceCoderImpl(SequenceCoderImpl):
   """A coder for homogeneous tuple objects."""
 
+  __slots__ = ()
+
   def _construct_from_sequence(self, components):
     return tuple(components)
 
@@ -620,6 +653,8 @@ class TupleSequenceCoderImpl(SequenceCoderImpl):
 class IterableCoderImpl(SequenceCoderImpl):
   """A coder for homogeneous iterable objects."""
 
+  __slots__ = ()
+
   def _construct_from_sequence(self, components):
     return components
 
@@ -627,6 +662,8 @@ class IterableCoderImpl(SequenceCoderImpl):
 class WindowedValueCoderImpl(StreamCoderImpl):
   """A coder for windowed values."""
 
+  __slots__ = ('_value_coder', '_timestamp_coder', '_windows_coder')
+
   # Ensure that lexicographic ordering of the bytes corresponds to
   # chronological order of timestamps.
   # TODO(BEAM-1524): Clean this up once we have a BEAM wide consensus on
@@ -729,4 +766,9 @@ class LengthPrefixCoderImpl(StreamCoderImpl):
 
   def estimate_size(self, value, nested=False):
     value_size = self._value_coder.estimate_size(value)
+    # Short-circuit the common one and two byte length prefixes.
+    if value_size < 128:
+      return 1 + value_size
+    elif value_size < 16384:
+      return 2 + value_size
     return get_varint_size(value_size) + value_size
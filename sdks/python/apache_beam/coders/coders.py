@@ -15,10 +15,14 @@
 # limitations under the License.
 #
 
-"""Collection of useful coders."""
+"""Collection of useful coders.
 
-import base64
-import cPickle as pickle
+This module may be optionally compiled with Cython; the coder classes remain
+ordinary Python classes so that they can be subclassed and pickled as usual.
+"""
+
+from binascii import a2b_base64
+from binascii import b2a_base64
 import google.protobuf
 
 from apache_beam.coders import coder_impl
@@ -26,10 +30,17 @@ from apache_beam.utils import urns
 from apache_beam.utils import proto_utils
 
 # pylint: disable=wrong-import-order, wrong-import-position, ungrouped-imports
+# The pickle functions are bound at module level so that calls skip the module
+# attribute lookup.  On Python 3, pickle itself re-exports the functions of
+# its _pickle C accelerator.
 try:
-  from stream import get_varint_size
+  from cPickle import HIGHEST_PROTOCOL
+  from cPickle import dumps as pickle_dumps
+  from cPickle import loads as pickle_loads
 except ImportError:
-  from slow_stream import get_varint_size
+  from pickle import HIGHEST_PROTOCOL
+  from pickle import dumps as pickle_dumps
+  from pickle import loads as pickle_loads
 # pylint: enable=wrong-import-order, wrong-import-position, ungrouped-imports
 
 
@@ -45,14 +56,35 @@ except ImportError:
   import dill
 
 
+# Instance attributes owned by the Coder base class that cache derived state:
+# the output of serialize_coder() and the hash of composite coders.  They are
+# excluded from the pickled state and from equality.
+_SERIALIZED_CACHE = '_coder_serialized'
+_HASH_CACHE = '_coder_hash'
+_CACHE_ATTRIBUTES = (_SERIALIZED_CACHE, _HASH_CACHE)
+
+
 def serialize_coder(coder):
-  from apache_beam.internal import pickler
-  return '%s$%s' % (coder.__class__.__name__, pickler.dumps(coder))
+  # Coders are immutable once constructed, so the serialized form is cached on
+  # the instance, or once per type for coders without state; nested coders are
+  # otherwise pickled repeatedly while the job description is assembled.
+  coder_type = type(coder)
+  if coder_type in _serialized_stateless_coders:
+    cache, key = _serialized_stateless_coders, coder_type
+  else:
+    cache, key = coder.__dict__, _SERIALIZED_CACHE
+  serialized = cache.get(key)
+  if serialized is None:
+    from apache_beam.internal import pickler
+    serialized = (
+        coder_type.__name__.encode('ascii') + b'$' + pickler.dumps(coder))
+    cache[key] = serialized
+  return serialized
 
 
 def deserialize_coder(serialized):
   from apache_beam.internal import pickler
-  return pickler.loads(serialized.split('$', 1)[1])
+  return pickler.loads(serialized.split(b'$', 1)[1])
 # pylint: enable=wrong-import-order, wrong-import-position
 
 
@@ -125,11 +157,10 @@ class Coder(object):
     return self._dict_without_impl()
 
   def _dict_without_impl(self):
-    if hasattr(self, '_impl'):
-      d = dict(self.__dict__)
-      del d['_impl']
-      return d
-    return self.__dict__
+    d = dict(self.__dict__)
+    for name in ('_impl',) + _CACHE_ATTRIBUTES:
+      d.pop(name, None)
+    return d
 
   @classmethod
   def from_type_hint(cls, unused_typehint, unused_registry):
@@ -167,10 +198,10 @@ class Coder(object):
         # job description JSON more readable.  Data before the $ is ignored by
         # the worker.
         '@type': serialize_coder(self),
-        'component_encodings': list(
+        'component_encodings': [
             component.as_cloud_object()
             for component in self._get_component_coders()
-        ),
+        ],
     }
     return value
 
@@ -238,24 +269,59 @@ class FastCoder(Coder):
   The Coder class defines _create_impl in terms of encode() and decode();
   this class inverts that by defining encode() and decode() in terms of
   _create_impl().
+
+  The impl is created on first use and kept as an ordinary instance
+  attribute, so that calls on the coder need not check for it.
   """
 
+  def __getattr__(self, name):
+    # Only reached while _impl is not set, i.e. before first use and on
+    # unpickled instances.
+    if name != '_impl':
+      raise AttributeError(
+          "'%s' object has no attribute '%s'" % (type(self).__name__, name))
+    impl = self._create_impl()
+    assert isinstance(impl, coder_impl.CoderImpl)
+    self._impl = impl
+    return impl
+
+  def get_impl(self):
+    return self._impl
+
   def encode(self, value):
     """Encodes the given object into a byte string."""
-    return self.get_impl().encode(value)
+    return self._impl.encode(value)
 
   def decode(self, encoded):
     """Decodes the given byte string into the corresponding object."""
-    return self.get_impl().decode(encoded)
+    return self._impl.decode(encoded)
 
   def estimate_size(self, value):
-    return self.get_impl().estimate_size(value)
+    return self._impl.estimate_size(value)
 
   def _create_impl(self):
     raise NotImplementedError
 
 
-class BytesCoder(FastCoder):
+class _StatelessCoderMixin(object):
+  """Mixin for coders whose instances carry no state.
+
+  Such instances are interchangeable, so constructing one of these coders
+  returns an instance shared per type, whose impl is only created once.
+  Subclasses, which may add state of their own, are constructed as usual.
+  """
+
+  def __new__(cls, *unused_args, **unused_kwargs):
+    if _StatelessCoderMixin not in cls.__bases__:
+      return super(_StatelessCoderMixin, cls).__new__(cls)
+    instance = cls.__dict__.get('_instance')
+    if instance is None:
+      instance = super(_StatelessCoderMixin, cls).__new__(cls)
+      cls._instance = instance
+    return instance
+
+
+class BytesCoder(_StatelessCoderMixin, FastCoder):
   """Byte string coder."""
 
   def _create_impl(self):
@@ -265,13 +331,13 @@ class BytesCoder(FastCoder):
     return True
 
   def __eq__(self, other):
-    return type(self) == type(other)
+    return type(self) is type(other)
 
   def __hash__(self):
     return hash(type(self))
 
 
-class VarIntCoder(FastCoder):
+class VarIntCoder(_StatelessCoderMixin, FastCoder):
   """Variable-length integer coder."""
 
   def _create_impl(self):
@@ -281,13 +347,13 @@ class VarIntCoder(FastCoder):
     return True
 
   def __eq__(self, other):
-    return type(self) == type(other)
+    return type(self) is type(other)
 
   def __hash__(self):
     return hash(type(self))
 
 
-class FloatCoder(FastCoder):
+class FloatCoder(_StatelessCoderMixin, FastCoder):
   """A coder used for floating-point values."""
 
   def _create_impl(self):
@@ -297,13 +363,13 @@ class FloatCoder(FastCoder):
     return True
 
   def __eq__(self, other):
-    return type(self) == type(other)
+    return type(self) is type(other)
 
   def __hash__(self):
     return hash(type(self))
 
 
-class TimestampCoder(FastCoder):
+class TimestampCoder(_StatelessCoderMixin, FastCoder):
   """A coder used for timeutil.Timestamp values."""
 
   def _create_impl(self):
@@ -313,7 +379,7 @@ class TimestampCoder(FastCoder):
     return True
 
   def __eq__(self, other):
-    return type(self) == type(other)
+    return type(self) is type(other)
 
   def __hash__(self):
     return hash(type(self))
@@ -332,7 +398,7 @@ class SingletonCoder(FastCoder):
     return True
 
   def __eq__(self, other):
-    return type(self) == type(other) and self._value == other._value
+    return type(self) is type(other) and self._value == other._value
 
   def __hash__(self):
     return hash(self._value)
@@ -343,15 +409,15 @@ def maybe_dill_dumps(o):
   # We need to use the dill pickler for objects of certain custom classes,
   # including, for example, ones that contain lambdas.
   try:
-    return pickle.dumps(o)
+    return pickle_dumps(o, HIGHEST_PROTOCOL)
   except Exception:  # pylint: disable=broad-except
-    return dill.dumps(o)
+    return dill.dumps(o, HIGHEST_PROTOCOL)
 
 
 def maybe_dill_loads(o):
   """Unpickle using cPickle or the Dill pickler as a fallback."""
   try:
-    return pickle.loads(o)
+    return pickle_loads(o)
   except Exception:  # pylint: disable=broad-except
     return dill.loads(o)
 
@@ -373,11 +439,10 @@ class _PickleCoderBase(FastCoder):
     # service expects a pair, it checks for the "is_pair_like" key, in which
     # case we would fail without the hack below.
     if is_pair_like:
+      # Both components are the non-pair description computed above; copy it
+      # rather than serializing this coder again for each of them.
+      value['component_encodings'] = [dict(value), dict(value)]
       value['is_pair_like'] = True
-      value['component_encodings'] = [
-          self.as_cloud_object(is_pair_like=False),
-          self.as_cloud_object(is_pair_like=False)
-      ]
 
     return value
 
@@ -394,20 +459,21 @@ class _PickleCoderBase(FastCoder):
     return self
 
   def __eq__(self, other):
-    return type(self) == type(other)
+    return type(self) is type(other)
 
   def __hash__(self):
     return hash(type(self))
 
 
-class PickleCoder(_PickleCoderBase):
+class PickleCoder(_StatelessCoderMixin, _PickleCoderBase):
   """Coder using Python's pickle functionality."""
 
   def _create_impl(self):
-    return coder_impl.CallbackCoderImpl(pickle.dumps, pickle.loads)
+    return coder_impl.CallbackCoderImpl(
+        lambda x: pickle_dumps(x, HIGHEST_PROTOCOL), pickle_loads)
 
 
-class DillCoder(_PickleCoderBase):
+class DillCoder(_StatelessCoderMixin, _PickleCoderBase):
   """Coder using dill's pickle functionality."""
 
   def _create_impl(self):
@@ -438,6 +504,10 @@ class DeterministicFastPrimitivesCoder(FastCoder):
     return self
 
 
+# Impl shared by the FastPrimitivesCoders with the default PickleCoder fallback.
+_default_fast_primitives_impl = None
+
+
 class FastPrimitivesCoder(FastCoder):
   """Encodes simple primitives (e.g. str, int) efficiently.
 
@@ -447,6 +517,14 @@ class FastPrimitivesCoder(FastCoder):
     self._fallback_coder = fallback_coder
 
   def _create_impl(self):
+    if type(self._fallback_coder) is PickleCoder:
+      # The impl has no state besides its fallback, which is shared for the
+      # stateless PickleCoder, so the impl can be shared as well.
+      global _default_fast_primitives_impl  # pylint: disable=global-statement
+      if _default_fast_primitives_impl is None:
+        _default_fast_primitives_impl = coder_impl.FastPrimitivesCoderImpl(
+            self._fallback_coder.get_impl())
+      return _default_fast_primitives_impl
     return coder_impl.FastPrimitivesCoderImpl(
         self._fallback_coder.get_impl())
 
@@ -460,11 +538,10 @@ class FastPrimitivesCoder(FastCoder):
     # service expects a pair, it checks for the "is_pair_like" key, in which
     # case we would fail without the hack below.
     if is_pair_like:
+      # Both components are the non-pair description computed above; copy it
+      # rather than serializing this coder again for each of them.
+      value['component_encodings'] = [dict(value), dict(value)]
       value['is_pair_like'] = True
-      value['component_encodings'] = [
-          self.as_cloud_object(is_pair_like=False),
-          self.as_cloud_object(is_pair_like=False)
-      ]
 
     return value
 
@@ -481,7 +558,7 @@ class FastPrimitivesCoder(FastCoder):
     return self
 
   def __eq__(self, other):
-    return type(self) == type(other)
+    return type(self) is type(other)
 
   def __hash__(self):
     return hash(type(self))
@@ -493,10 +570,11 @@ class Base64PickleCoder(Coder):
   # than via a special Coder.
 
   def encode(self, value):
-    return base64.b64encode(pickle.dumps(value))
+    # b2a_base64 appends a newline, which base64.b64encode would strip.
+    return b2a_base64(pickle_dumps(value, HIGHEST_PROTOCOL))[:-1]
 
   def decode(self, encoded):
-    return pickle.loads(base64.b64decode(encoded))
+    return pickle_loads(a2b_base64(encoded))
 
   def is_deterministic(self):
     # Note that the Base64PickleCoder is not deterministic.  See the
@@ -544,7 +622,7 @@ class ProtoCoder(FastCoder):
     return False
 
   def __eq__(self, other):
-    return (type(self) == type(other)
+    return (type(self) is type(other)
             and self.proto_message_type == other.proto_message_type)
 
   def __hash__(self):
@@ -564,9 +642,10 @@ class TupleCoder(FastCoder):
 
   def __init__(self, components):
     self._coders = tuple(components)
+    self._is_kv = len(self._coders) == 2
 
   def _create_impl(self):
-    return coder_impl.TupleCoderImpl([c.get_impl() for c in self._coders])
+    return coder_impl.TupleCoderImpl(tuple(c.get_impl() for c in self._coders))
 
   def is_deterministic(self):
     return all(c.is_deterministic() for c in self._coders)
@@ -580,10 +659,10 @@ class TupleCoder(FastCoder):
       return {
           '@type': 'kind:pair',
           'is_pair_like': True,
-          'component_encodings': list(
+          'component_encodings': [
               component.as_cloud_object()
               for component in self._get_component_coders()
-          ),
+          ],
       }
 
     return super(TupleCoder, self).as_cloud_object()
@@ -595,15 +674,15 @@ class TupleCoder(FastCoder):
     return self._coders
 
   def is_kv_coder(self):
-    return len(self._coders) == 2
+    return self._is_kv
 
   def key_coder(self):
-    if len(self._coders) != 2:
+    if not self._is_kv:
       raise ValueError('TupleCoder does not have exactly 2 components.')
     return self._coders[0]
 
   def value_coder(self):
-    if len(self._coders) != 2:
+    if not self._is_kv:
       raise ValueError('TupleCoder does not have exactly 2 components.')
     return self._coders[1]
 
@@ -611,11 +690,15 @@ class TupleCoder(FastCoder):
     return 'TupleCoder[%s]' % ', '.join(str(c) for c in self._coders)
 
   def __eq__(self, other):
-    return (type(self) == type(other)
-            and self._coders == self._coders)
+    return (type(self) is type(other)
+            and self._coders == other._coders)
 
   def __hash__(self):
-    return hash(self._coders)
+    # Composite coders are immutable, so their (recursive) hash is cached.
+    h = self.__dict__.get(_HASH_CACHE)
+    if h is None:
+      h = self.__dict__[_HASH_CACHE] = hash(self._coders)
+    return h
 
 
 class TupleSequenceCoder(FastCoder):
@@ -641,11 +724,14 @@ class TupleSequenceCoder(FastCoder):
     return 'TupleSequenceCoder[%r]' % self._elem_coder
 
   def __eq__(self, other):
-    return (type(self) == type(other)
-            and self._elem_coder == self._elem_coder)
+    return (type(self) is type(other)
+            and self._elem_coder == other._elem_coder)
 
   def __hash__(self):
-    return hash((type(self), self._elem_coder))
+    h = self.__dict__.get(_HASH_CACHE)
+    if h is None:
+      h = self.__dict__[_HASH_CACHE] = hash((type(self), self._elem_coder))
+    return h
 
 
 class IterableCoder(FastCoder):
@@ -681,11 +767,14 @@ class IterableCoder(FastCoder):
     return 'IterableCoder[%r]' % self._elem_coder
 
   def __eq__(self, other):
-    return (type(self) == type(other)
-            and self._elem_coder == self._elem_coder)
+    return (type(self) is type(other)
+            and self._elem_coder == other._elem_coder)
 
   def __hash__(self):
-    return hash((type(self), self._elem_coder))
+    h = self.__dict__.get(_HASH_CACHE)
+    if h is None:
+      h = self.__dict__[_HASH_CACHE] = hash((type(self), self._elem_coder))
+    return h
 
 
 class GlobalWindowCoder(SingletonCoder):
@@ -701,7 +790,7 @@ class GlobalWindowCoder(SingletonCoder):
     }
 
 
-class IntervalWindowCoder(FastCoder):
+class IntervalWindowCoder(_StatelessCoderMixin, FastCoder):
   """Coder for an window defined by a start timestamp and a duration."""
 
   def _create_impl(self):
@@ -716,7 +805,7 @@ class IntervalWindowCoder(FastCoder):
     }
 
   def __eq__(self, other):
-    return type(self) == type(other)
+    return type(self) is type(other)
 
   def __hash__(self):
     return hash(type(self))
@@ -731,6 +820,7 @@ class WindowedValueCoder(FastCoder):
     self.wrapped_value_coder = wrapped_value_coder
     self.timestamp_coder = TimestampCoder()
     self.window_coder = window_coder
+    self._is_kv = wrapped_value_coder.is_kv_coder()
 
   def _create_impl(self):
     return coder_impl.WindowedValueCoderImpl(
@@ -756,7 +846,7 @@ class WindowedValueCoder(FastCoder):
     return [self.wrapped_value_coder, self.window_coder]
 
   def is_kv_coder(self):
-    return self.wrapped_value_coder.is_kv_coder()
+    return self._is_kv
 
   def key_coder(self):
     return self.wrapped_value_coder.key_coder()
@@ -768,14 +858,20 @@ class WindowedValueCoder(FastCoder):
     return 'WindowedValueCoder[%s]' % self.wrapped_value_coder
 
   def __eq__(self, other):
-    return (type(self) == type(other)
-            and self.wrapped_value_coder == other.wrapped_value_coder
-            and self.timestamp_coder == other.timestamp_coder
-            and self.window_coder == other.window_coder)
+    # Tuple comparison skips the __eq__ call for identical (e.g. shared)
+    # component coders.
+    return (type(self) is type(other)
+            and (self.wrapped_value_coder, self.timestamp_coder,
+                 self.window_coder)
+            == (other.wrapped_value_coder, other.timestamp_coder,
+                other.window_coder))
 
   def __hash__(self):
-    return hash(
-        (self.wrapped_value_coder, self.timestamp_coder, self.window_coder))
+    h = self.__dict__.get(_HASH_CACHE)
+    if h is None:
+      h = self.__dict__[_HASH_CACHE] = hash(
+          (self.wrapped_value_coder, self.timestamp_coder, self.window_coder))
+    return h
 
 
 class LengthPrefixCoder(FastCoder):
@@ -790,10 +886,6 @@ class LengthPrefixCoder(FastCoder):
   def is_deterministic(self):
     return self._value_coder.is_deterministic()
 
-  def estimate_size(self, value):
-    value_size = self._value_coder.estimate_size(value)
-    return get_varint_size(value_size) + value_size
-
   def value_coder(self):
     return self._value_coder
 
@@ -810,8 +902,17 @@ class LengthPrefixCoder(FastCoder):
     return 'LengthPrefixCoder[%r]' % self._value_coder
 
   def __eq__(self, other):
-    return (type(self) == type(other)
+    return (type(self) is type(other)
             and self._value_coder == other._value_coder)
 
   def __hash__(self):
-    return hash((type(self), self._value_coder))
+    h = self.__dict__.get(_HASH_CACHE)
+    if h is None:
+      h = self.__dict__[_HASH_CACHE] = hash((type(self), self._value_coder))
+    return h
+
+
+# Serialized forms of the coder types whose instances carry no state, filled in
+# by serialize_coder.
+_serialized_stateless_coders = dict.fromkeys(
+    _StatelessCoderMixin.__subclasses__())
@@ -18,10 +18,12 @@
 
 import base64
 import logging
+import pickle
 import unittest
 
 from apache_beam import coders
 from apache_beam.coders import proto2_coder_test_messages_pb2 as test_message
+from apache_beam.internal import pickler
 
 
 class PickleCoderTest(unittest.TestCase):
@@ -36,6 +38,22 @@ class PickleCoderTest(unittest.TestCase):
         coders.Base64PickleCoder().encode(v),
         base64.b64encode(coders.PickleCoder().encode(v)))
 
+  def test_binary_protocol(self):
+    # Protocol 2 and above start with the PROTO opcode.
+    self.assertEqual('\x80', coders.PickleCoder().encode(1)[0])
+    self.assertEqual('\x80', coders.DillCoder().encode(1)[0])
+
+  def test_pair_like_cloud_object(self):
+    for coder in (coders.PickleCoder(), coders.FastPrimitivesCoder()):
+      leaf = coder.as_cloud_object(is_pair_like=False)
+      self.assertEqual(
+          {
+              '@type': leaf['@type'],
+              'is_pair_like': True,
+              'component_encodings': [leaf, leaf],
+          },
+          coder.as_cloud_object())
+
   def test_equality(self):
     self.assertEquals(coders.PickleCoder(), coders.PickleCoder())
     self.assertEquals(coders.Base64PickleCoder(), coders.Base64PickleCoder())
@@ -43,6 +61,183 @@ class PickleCoderTest(unittest.TestCase):
     self.assertNotEquals(coders.Base64PickleCoder(), object())
 
 
+class FastCoderTest(unittest.TestCase):
+
+  def test_impl_created_on_first_use(self):
+    coder = coders.TupleCoder((coders.VarIntCoder(), coders.BytesCoder()))
+    self.assertNotIn('_impl', coder.__dict__)
+    self.assertEqual((1, 'a'), coder.decode(coder.encode((1, 'a'))))
+    self.assertIn('_impl', coder.__dict__)
+    self.assertIs(coder.get_impl(), coder.get_impl())
+
+  def test_subclass_state_set_after_super_init(self):
+    coder = _WrappingCoder(coders.VarIntCoder())
+    self.assertEqual(5, coder.decode(coder.encode(5)))
+
+  def test_encode_picklable(self):
+    coder = coders.TupleCoder((coders.VarIntCoder(), coders.BytesCoder()))
+    encode = pickler.loads(pickler.dumps(coder.encode))
+    self.assertEqual(coder.encode((1, 'a')), encode((1, 'a')))
+    encode = pickler.loads(pickler.dumps(coders.VarIntCoder().encode))
+    self.assertEqual(coders.VarIntCoder().encode(5), encode(5))
+
+  def test_impls_have_no_instance_dict(self):
+    # Only impls declared in coder_impl.pxd; others need a __dict__ for their
+    # methods to override the compiled ones.
+    for coder in (coders.WindowedValueCoder(coders.FastPrimitivesCoder()),
+                  coders.TupleCoder((coders.VarIntCoder(),
+                                     coders.BytesCoder()))):
+      self.assertFalse(hasattr(coder.get_impl(), '__dict__'), coder)
+
+  def test_stateless_coders_shared(self):
+    self.assertIs(coders.VarIntCoder(), coders.VarIntCoder())
+    self.assertIs(coders.PickleCoder(), coders.PickleCoder())
+    wv_coder = coders.WindowedValueCoder(coders.BytesCoder())
+    self.assertIs(coders.TimestampCoder(), wv_coder.timestamp_coder)
+    self.assertIs(coders.PickleCoder(), wv_coder.window_coder)
+    self.assertIs(coders.PickleCoder(),
+                  pickle.loads(pickle.dumps(coders.PickleCoder(), 2)))
+
+  def test_default_fast_primitives_impl_shared(self):
+    self.assertIs(coders.FastPrimitivesCoder().get_impl(),
+                  coders.FastPrimitivesCoder().get_impl())
+    self.assertIsNot(coders.FastPrimitivesCoder().get_impl(),
+                     coders.FastPrimitivesCoder(coders.DillCoder()).get_impl())
+
+  def test_stateless_coder_subclasses_not_shared(self):
+
+    class SubclassedBytesCoder(coders.BytesCoder):
+      pass
+
+    self.assertIsNot(SubclassedBytesCoder(), SubclassedBytesCoder())
+    self.assertIsNot(coders.BytesCoder(), SubclassedBytesCoder())
+
+  def test_fixed_size_estimates(self):
+    # These estimates are constant and must not encode the value.
+    unencodable = object()
+    self.assertEqual(8, coders.FloatCoder().estimate_size(unencodable))
+    self.assertEqual(8, coders.TimestampCoder().estimate_size(unencodable))
+    self.assertEqual(0, coders.SingletonCoder(None).estimate_size(unencodable))
+
+  def test_pickled_state_excludes_impl(self):
+    coder = coders.TupleCoder((coders.VarIntCoder(), coders.BytesCoder()))
+    coder.get_impl()
+    self.assertNotIn('_impl', coder.__getstate__())
+    copy = pickle.loads(pickle.dumps(coder))
+    self.assertEqual(coder, copy)
+    self.assertEqual((1, 'a'), copy.decode(coder.encode((1, 'a'))))
+
+
+class _WrappingCoder(coders.FastCoder):
+
+  def __init__(self, inner_coder):
+    super(_WrappingCoder, self).__init__()
+    self._inner_coder = inner_coder
+
+  def _create_impl(self):
+    return self._inner_coder.get_impl()
+
+
+class CompositeCoderEqualityTest(unittest.TestCase):
+
+  def test_tuple_coder_equality(self):
+    self.assertEqual(
+        coders.TupleCoder((coders.VarIntCoder(), coders.BytesCoder())),
+        coders.TupleCoder((coders.VarIntCoder(), coders.BytesCoder())))
+    self.assertNotEqual(
+        coders.TupleCoder((coders.VarIntCoder(), coders.BytesCoder())),
+        coders.TupleCoder((coders.BytesCoder(), coders.VarIntCoder())))
+
+  def test_sequence_coder_equality(self):
+    for coder_type in (coders.TupleSequenceCoder, coders.IterableCoder):
+      self.assertEqual(coder_type(coders.VarIntCoder()),
+                       coder_type(coders.VarIntCoder()))
+      self.assertNotEqual(coder_type(coders.VarIntCoder()),
+                          coder_type(coders.BytesCoder()))
+    self.assertNotEqual(coders.TupleSequenceCoder(coders.VarIntCoder()),
+                        coders.IterableCoder(coders.VarIntCoder()))
+
+  def test_windowed_value_coder_equality(self):
+    self.assertEqual(coders.WindowedValueCoder(coders.VarIntCoder()),
+                     coders.WindowedValueCoder(coders.VarIntCoder()))
+    self.assertNotEqual(coders.WindowedValueCoder(coders.VarIntCoder()),
+                        coders.WindowedValueCoder(coders.BytesCoder()))
+    self.assertNotEqual(
+        coders.WindowedValueCoder(coders.VarIntCoder()),
+        coders.WindowedValueCoder(coders.VarIntCoder(),
+                                  coders.IntervalWindowCoder()))
+
+  def test_hash_cached(self):
+    coder = coders.WindowedValueCoder(
+        coders.TupleCoder((coders.VarIntCoder(), coders.BytesCoder())))
+    self.assertEqual(hash(coder), hash(coder))
+    self.assertIn('_coder_hash', coder.__dict__)
+    self.assertNotIn('_coder_hash', coder.__getstate__())
+    copy = pickle.loads(pickle.dumps(coder))
+    self.assertEqual(coder, copy)
+    self.assertEqual(hash(coder), hash(copy))
+
+  def test_user_attributes_kept_in_state(self):
+    coder = _AttributeCoder()
+    state = coder.__getstate__()
+    self.assertEqual('hash', state['_hash'])
+    self.assertEqual('encode', state['encode'])
+    self.assertNotEqual(coder, _AttributeCoder(encode='other'))
+
+
+class _AttributeCoder(coders.Coder):
+
+  def __init__(self, encode='encode'):
+    self._hash = 'hash'
+    self.encode = encode
+
+
+class KvCoderTest(unittest.TestCase):
+
+  def test_tuple_coder(self):
+    kv_coder = coders.TupleCoder((coders.VarIntCoder(), coders.BytesCoder()))
+    self.assertTrue(kv_coder.is_kv_coder())
+    self.assertEqual(coders.VarIntCoder(), kv_coder.key_coder())
+    self.assertEqual(coders.BytesCoder(), kv_coder.value_coder())
+    triple_coder = coders.TupleCoder((coders.VarIntCoder(),) * 3)
+    self.assertFalse(triple_coder.is_kv_coder())
+    with self.assertRaises(ValueError):
+      triple_coder.key_coder()
+    with self.assertRaises(ValueError):
+      triple_coder.value_coder()
+
+  def test_windowed_value_coder(self):
+    kv_coder = coders.TupleCoder((coders.VarIntCoder(), coders.BytesCoder()))
+    self.assertTrue(coders.WindowedValueCoder(kv_coder).is_kv_coder())
+    self.assertEqual(
+        coders.BytesCoder(), coders.WindowedValueCoder(kv_coder).value_coder())
+    self.assertFalse(
+        coders.WindowedValueCoder(coders.VarIntCoder()).is_kv_coder())
+
+
+class SerializeCoderTest(unittest.TestCase):
+
+  def test_serialized_form_cached(self):
+    coder = coders.TupleCoder((coders.VarIntCoder(), coders.PickleCoder()))
+    serialized = coders.serialize_coder(coder)
+    self.assertTrue(serialized.startswith(b'TupleCoder$'), serialized)
+    self.assertIs(serialized, coders.serialize_coder(coder))
+    self.assertNotIn('_coder_serialized', coder.__getstate__())
+    self.assertEqual(coder, coders.deserialize_coder(serialized))
+    self.assertEqual(
+        coders.DeterministicFastPrimitivesCoder(coders.PickleCoder(), 'step'),
+        coders.deserialize_coder(coders.serialize_coder(
+            coders.DeterministicFastPrimitivesCoder(
+                coders.PickleCoder(), 'step'))))
+
+  def test_stateless_coders_serialized_once_per_type(self):
+    first, second = coders.VarIntCoder(), coders.VarIntCoder()
+    serialized = coders.serialize_coder(first)
+    self.assertIs(serialized, coders.serialize_coder(second))
+    self.assertNotIn('_coder_serialized', second.__dict__)
+    self.assertEqual(second, coders.deserialize_coder(serialized))
+
+
 class CodersTest(unittest.TestCase):
 
   def test_str_utf8_coder(self):
@@ -354,6 +354,8 @@ class CodersTest(unittest.TestCase):
     self.assertEqual('\xff\x7f' + 'z' * 16383, coder.encode('z' * 16383))
     # Test unnested
     self.check_coder(coder, '', 'a', 'bc', 'def')
+    # Test varint size boundaries of the length prefix
+    self.check_coder(coder, 'z' * 127, 'z' * 128, 'z' * 16383, 'z' * 16384)
     # Test nested
     self.check_coder(coders.TupleCoder((coder, coder)),
                      ('', 'a'),
@@ -154,10 +154,5 @@ def get_varint_size(v):
     v += 1 << 64
     if v <= 0:
       raise ValueError('Value too large (negative).')
-  varint_size = 0
-  while True:
-    varint_size += 1
-    v >>= 7
-    if not v:
-      break
-  return varint_size
+  # Each byte holds 7 bits of the value, and 0 still takes one byte.
+  return (v.bit_length() + 6) // 7 or 1
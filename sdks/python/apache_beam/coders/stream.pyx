@@ -18,6 +18,10 @@
 cimport libc.stdlib
 cimport libc.string
 
+cdef extern from *:
+  # Count of leading zero bits; undefined for 0.  Provided by GCC and Clang.
+  int __builtin_clzll(unsigned long long)
+
 
 cdef class OutputStream(object):
   """An output string stream implementation supporting write() and get()."""
@@ -216,11 +220,6 @@ cdef class InputStream(object):
 
 cpdef libc.stdint.int64_t get_varint_size(libc.stdint.int64_t value):
   """Returns the size of the given integer value when encode as a VarInt."""
-  cdef libc.stdint.int64_t varint_size = 0
   cdef libc.stdint.uint64_t bits = value
-  while True:
-    varint_size += 1
-    bits >>= 7
-    if not bits:
-      break
-  return varint_size
+  # Each byte holds 7 bits of the value; or-ing in 1 makes 0 take one byte.
+  return (70 - __builtin_clzll(bits | 1)) // 7
@@ -30,6 +30,7 @@ class StreamTest(unittest.TestCase):
   InputStream = slow_stream.InputStream
   OutputStream = slow_stream.OutputStream
   ByteCountingOutputStream = slow_stream.ByteCountingOutputStream
+  get_varint_size = staticmethod(slow_stream.get_varint_size)
   # pylint: enable=invalid-name
 
   def test_read_write(self):
@@ -88,6 +89,14 @@ class StreamTest(unittest.TestCase):
   def test_large_var_int64(self):
     self.run_read_write_var_int64([0, 2**63 - 1, -2**63, 2**63 - 3])
 
+  def test_varint_size(self):
+    values = [0, 127, 128, 16383, 16384, 2**63 - 1, -1, -2**63]
+    values += [2**k for k in range(63)] + [2**k - 1 for k in range(1, 64)]
+    for v in values:
+      out_s = self.OutputStream()
+      out_s.write_var_int64(v)
+      self.assertEquals(len(out_s.get()), self.get_varint_size(v), v)
+
   def test_read_write_double(self):
     values = 0, 1, -1, 1e100, 1.0/3, math.pi, float('inf')
     out_s = self.OutputStream()
@@ -158,6 +167,7 @@ try:
     InputStream = stream.InputStream
     OutputStream = stream.OutputStream
     ByteCountingOutputStream = stream.ByteCountingOutputStream
+    get_varint_size = staticmethod(stream.get_varint_size)
 
   class SlowFastStreamTest(StreamTest):
     """Runs the test with compiled and uncompiled stream classes."""